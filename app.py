@@ -1,6 +1,22 @@
+import io
+import os
+import re
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
 import gradio as gr
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
 from PIL import Image
+from worker import loop, run_and_stream_result
+
+try:
+    import pyvips
+except ImportError:
+    pyvips = None
+
 
 def get_supported_formats():
     """
@@ -12,11 +28,453 @@ def get_supported_formats():
     return supported_formats
 
 
+# load every Pillow plugin at import instead of on the first request
+Image.init()
 SUPPORTED_FORMATS = get_supported_formats()
+CACHE_DIR = Path("caches")
+CACHE_DIR.mkdir(parents=True, exist_ok=True)
+# least recently used outputs are evicted once the cache grows past this
+CACHE_MAX_BYTES = 1 << 30
+OUTPUT_EXTENSIONS = (
+    ".webp",
+    ".png",
+    ".jpg",
+    ".jpeg",
+    ".gif",
+    ".bmp",
+    ".tiff",
+    ".tif",
+)
+EXT_TO_PIL = {
+    ext: SUPPORTED_FORMATS[ext]
+    for ext in OUTPUT_EXTENSIONS
+    if ext in SUPPORTED_FORMATS
+}
+# libwebp speed/size tradeoff exposed in the UI
+WEBP_METHODS = {"Fast": 0, "Balanced": 4, "Small": 6}
+# inputs above this pixel count are streamed through libvips when available
+LARGE_IMAGE_PIXELS = 48_000_000
+# output formats libvips can save natively
+VIPS_FORMATS = ("WEBP", "PNG", "JPEG", "TIFF")
+# formats that never lose information, so a same-format input is copied
+LOSSLESS_FORMATS = ("PNG", "BMP", "TIFF", "GIF")
+# IJG luminance quantization table at quality 50, for estimating JPEG quality
+JPEG_LUMA_TABLE = (
+    16, 11, 10, 16, 24, 40, 51, 61,
+    12, 12, 14, 19, 26, 58, 60, 55,
+    14, 13, 16, 24, 40, 57, 69, 56,
+    14, 17, 22, 29, 51, 87, 80, 62,
+    18, 22, 37, 56, 68, 109, 103, 77,
+    24, 35, 55, 64, 81, 104, 113, 92,
+    49, 64, 78, 87, 103, 121, 120, 101,
+    72, 92, 95, 98, 112, 100, 103, 99,
+)  # fmt: skip
+# image modes each encoder can write, unlisted encoders convert by themselves
+SAVE_MODES = {
+    "JPEG": ("1", "L", "RGB", "CMYK"),
+    "PNG": ("1", "L", "LA", "P", "RGB", "RGBA", "I", "I;16"),
+    "BMP": ("1", "L", "P", "RGB", "RGBA"),
+    "GIF": ("1", "L", "P", "RGB", "RGBA", "LA"),
+}
+# bounding box of the gallery previews
+PREVIEW_SIZE = (1024, 1024)
+# number of conversions kept in the in-process memo
+MEMO_SIZE = 64
+MEMO = OrderedDict()
+MEMO_LOCK = threading.Lock()
+# pending requests beyond this are rejected instead of held in memory
+QUEUE_MAX_SIZE = 32
+# set USE_PROCESS_POOL=1 when GIL-bound conversions keep threads from scaling
+USE_PROCESS_POOL = os.environ.get("USE_PROCESS_POOL", "0") == "1"
+
+# a single worker thread serves every conversion request in order
+threading.Thread(target=loop, daemon=True).start()
+
+
+def get_content_hash(input_image: str) -> str:
+    """
+    A function that computes a short hash of the bytes of an input image.
+
+    Parameters:
+        input_image (str): The path to the input image file.
+
+    Returns:
+        str: The hex digest of the file content.
+    """
+    h = hashlib.blake2b(digest_size=8)
+    with open(input_image, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def get_output_stem(input_image: str) -> str:
+    """
+    A function that builds a file name stem safe to use inside the cache directory.
+
+    Parameters:
+        input_image (str): The path to the input image file.
+
+    Returns:
+        str: The sanitized stem of the input file name.
+    """
+    stem = re.sub(r"[^\w.-]", "_", Path(input_image).stem).lstrip(".")
+    return stem or "image"
+
+
+def get_output_path(
+    input_image: str, content_hash: str, ext: str, params: dict
+) -> Path:
+    """
+    A function that builds the cached output path for an input image.
+
+    Parameters:
+        input_image (str): The path to the input image file.
+        content_hash (str): The hash of the input image content.
+        ext (str): The extension for the output format.
+        params (dict): The encoder keyword arguments the output depends on.
+
+    Returns:
+        Path: The path of the output file inside the cache directory.
+    """
+    key = hashlib.blake2b(
+        repr((content_hash, ext, sorted(params.items()))).encode(),
+        digest_size=6,
+    ).hexdigest()
+    return CACHE_DIR / "{}.{}{}".format(get_output_stem(input_image), key, ext)
+
+
+def prune_cache(max_bytes: int = CACHE_MAX_BYTES):
+    """
+    A function that deletes the least recently used outputs until the cache fits in a size budget.
+
+    Parameters:
+        max_bytes (int, optional): The size budget of the cache directory. Defaults to CACHE_MAX_BYTES.
+    """
+    entries = []
+    for entry in os.scandir(CACHE_DIR):
+        try:
+            stat = entry.stat()
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, entry.path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+
+
+def open_sequential(path: str):
+    """
+    A function that opens a file for a single sequential read.
+
+    Parameters:
+        path (str): The path to the file.
+
+    Returns:
+        file: The file object opened in binary mode.
+    """
+    f = open(path, "rb")
+    if hasattr(os, "posix_fadvise"):
+        os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+    return f
+
+
+def drop_page_cache(f):
+    """
+    A function that asks the kernel to evict a file that has been read once from the page cache.
+
+    Parameters:
+        f (file): The file object opened for reading.
+    """
+    if hasattr(os, "posix_fadvise"):
+        os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+
+
+def write_atomic(file_path: Path, data: bytes):
+    """
+    A function that writes a file so that it never appears partially written.
+
+    On Linux the data goes to an anonymous O_TMPFILE that is linked into place
+    once complete, elsewhere to a temporary file renamed over the target.
+
+    Parameters:
+        file_path (Path): The path to the output file.
+        data (bytes): The file content.
+    """
+    if hasattr(os, "O_TMPFILE"):
+        try:
+            fd = os.open(file_path.parent, os.O_TMPFILE | os.O_WRONLY, 0o644)
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+                f.flush()
+                os.link("/proc/self/fd/{}".format(fd), file_path)
+            return
+        except FileExistsError:
+            # a concurrent conversion already produced this output
+            return
+        except OSError:
+            # O_TMPFILE or linking it is unsupported, use a named file
+            pass
+    fd, tmp_path = tempfile.mkstemp(
+        dir=file_path.parent, suffix=file_path.suffix
+    )
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def estimate_jpeg_quality(img: Image.Image):
+    """
+    A function that estimates the IJG quality a JPEG image was saved with.
+
+    Parameters:
+        img (Image): The opened JPEG image.
+
+    Returns:
+        int: The estimated quality from 1 to 100, or None if it is unknown.
+    """
+    tables = getattr(img, "quantization", None)
+    if not tables or 0 not in tables:
+        return None
+    # the ratio of the sums does not depend on the table order
+    scale = 100 * sum(tables[0]) / sum(JPEG_LUMA_TABLE)
+    if scale <= 100:
+        quality = (200 - scale) / 2
+    else:
+        quality = 5000 / scale
+    return max(1, min(100, round(quality)))
+
+
+def is_lossless_webp(input_image: str) -> bool:
+    """
+    A function that checks whether a WebP file holds a single lossless (VP8L) bitstream.
+
+    Parameters:
+        input_image (str): The path to the WebP file.
+
+    Returns:
+        bool: True if the image is lossless WebP.
+    """
+    with open(input_image, "rb") as f:
+        header = f.read(12)
+        if header[:4] != b"RIFF" or header[8:12] != b"WEBP":
+            return False
+        while True:
+            chunk = f.read(8)
+            if len(chunk) < 8:
+                return False
+            fourcc = chunk[:4]
+            if fourcc == b"VP8L":
+                return True
+            if fourcc in (b"VP8 ", b"ANMF"):
+                return False
+            size = int.from_bytes(chunk[4:], "little")
+            f.seek(size + (size & 1), os.SEEK_CUR)
+
+
+def can_copy_source(
+    input_image: str, format: str, quality: int, lossless: bool
+) -> bool:
+    """
+    A function that checks whether copying an input beats re-encoding it.
+
+    A copy is used when the input is already in the output format and
+    re-encoding cannot make it smaller without dropping below its quality:
+    lossless formats, lossless WebP requested for a lossless WebP, or a JPEG
+    requested at or above its own quality.
+
+    Parameters:
+        input_image (str): The path to the input image file.
+        format (str): The PIL format name of the output image.
+        quality (int): The quality of the output image.
+        lossless (bool): Whether to encode WebP losslessly.
+
+    Returns:
+        bool: True if the input can be copied as the output.
+    """
+    if SUPPORTED_FORMATS.get(Path(input_image).suffix.lower()) != format:
+        return False
+    with Image.open(input_image) as probe:
+        if probe.format != format:
+            return False
+        if format in LOSSLESS_FORMATS:
+            return True
+        if format == "JPEG":
+            source_quality = estimate_jpeg_quality(probe)
+            return source_quality is not None and quality >= source_quality
+    if format == "WEBP":
+        return lossless and is_lossless_webp(input_image)
+    return False
+
+
+def load_preview(input_image: str):
+    """
+    A function that decodes an input image as a gallery thumbnail.
+
+    For JPEG inputs, `thumbnail` lets libjpeg decode at a reduced scale close
+    to PREVIEW_SIZE, other formats are decoded in full and then downscaled.
+
+    Parameters:
+        input_image (str): The path to the input image file.
+
+    Returns:
+        Image: The preview image in RGBA format.
+    """
+    preview = Image.open(input_image)
+    preview.thumbnail(PREVIEW_SIZE, Image.Resampling.LANCZOS)
+    return preview.convert("RGBA")
+
+
+def get_save_image(img: Image.Image, format: str) -> Image.Image:
+    """
+    A function that converts an image only when the output format cannot store its mode.
+
+    Parameters:
+        img (Image): The decoded source image.
+        format (str): The PIL format name of the output image.
+
+    Returns:
+        Image: The image to encode, `img` itself when no conversion is needed.
+    """
+    modes = SAVE_MODES.get(format)
+    if modes is None or img.mode in modes:
+        return img
+    has_alpha = "A" in img.mode or "transparency" in img.info
+    return img.convert("RGBA" if has_alpha and "RGBA" in modes else "RGB")
+
+
+def get_save_params(
+    format: str, quality: int = 80, method: int = 0, lossless: bool = False
+):
+    """
+    A function that builds the encoder keyword arguments for `Image.save`.
+
+    Parameters:
+        format (str): The PIL format name of the output image.
+        quality (int, optional): The quality of the output image. Defaults to 80.
+        method (int, optional): The libwebp encoding method, 0 (fast) to 6 (small). Defaults to 0.
+        lossless (bool, optional): Whether to encode WebP losslessly. Defaults to False.
+
+    Returns:
+        dict: The keyword arguments for `Image.save`, only those the format uses.
+    """
+    params = {}
+    if format in ("JPEG", "WEBP"):
+        params["quality"] = quality
+    if format == "WEBP":
+        params["method"] = method
+        params["lossless"] = lossless
+    return params
+
+
+def encode_image(img: Image.Image, format: str, **params) -> bytes:
+    """
+    A function that encodes an image into an in-memory buffer.
+
+    Parameters:
+        img (Image): The image to encode.
+        format (str): The PIL format name of the output image.
+        **params: The encoder keyword arguments for `Image.save`.
+
+    Returns:
+        bytes: The encoded image.
+    """
+    buf = io.BytesIO()
+    img.save(buf, format, **params)
+    return buf.getvalue()
+
+
+def convert_with_vips(
+    image,
+    input_image: str,
+    file_path: Path,
+    format: str,
+    quality: int = 80,
+    method: int = 0,
+    lossless: bool = False,
+):
+    """
+    A function that converts a large image with libvips, which streams it in tiles with constant memory.
+
+    Parameters:
+        image (pyvips.Image): The input image opened with sequential access.
+        input_image (str): The path to the input image file.
+        file_path (Path): The path to the output image file.
+        format (str): The PIL format name of the output image.
+        quality (int, optional): The quality of the output image. Defaults to 80.
+        method (int, optional): The libwebp encoding method, 0 (fast) to 6 (small). Defaults to 0.
+        lossless (bool, optional): Whether to encode WebP losslessly. Defaults to False.
+
+    Returns:
+        Image: The preview image in RGBA format.
+    """
+    params = {}
+    if format in ("WEBP", "JPEG"):
+        params["Q"] = quality
+    if format == "WEBP":
+        params["effort"] = method
+        params["lossless"] = lossless
+    # libvips streams to disk, so write a temporary file and rename it
+    fd, tmp_path = tempfile.mkstemp(
+        dir=file_path.parent, suffix=file_path.suffix
+    )
+    os.close(fd)
+    try:
+        image.write_to_file(tmp_path, **params)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    thumb = pyvips.Image.thumbnail(
+        input_image, PREVIEW_SIZE[0], height=PREVIEW_SIZE[1]
+    )
+    # the input is not read again, the output is read back by Gradio
+    with open(input_image, "rb") as f:
+        drop_page_cache(f)
+    preview = Image.open(io.BytesIO(thumb.write_to_buffer(".png")))
+    return preview.convert("RGBA")
+
+
+def save_preview(preview: Image.Image, file_path: str) -> str:
+    """
+    A function that writes a gallery preview next to its output file.
+
+    Streaming re-sends the whole gallery on every update, so a small file is
+    only re-hashed by Gradio, while a PIL image would be re-encoded each time.
+
+    Parameters:
+        preview (Image): The preview image in RGBA format.
+        file_path (str): The path to the converted output file.
+
+    Returns:
+        str: The path to the preview file.
+    """
+    preview_path = Path(file_path).with_suffix(".preview.webp")
+    write_atomic(
+        preview_path, encode_image(preview, "WEBP", quality=80, method=0)
+    )
+    return str(preview_path)
 
 
 def convert_format(
-    input_image: str = None, ext: str = ".webp", quality: int = 80
+    input_image: str = None,
+    ext: str = ".webp",
+    quality: int = 80,
+    method: int = 0,
+    lossless: bool = False,
+    content_hash: str = None,
 ):
     """
     A function that converts an input image to a specified format with a given quality.
@@ -25,32 +483,138 @@ def convert_format(
         input_image (str): The path to the input image file.
         ext (str, optional): The extension for the output format. Defaults to ".webp".
         quality (int, optional): The quality of the output image. Defaults to 80.
+        method (int, optional): The libwebp encoding method, 0 (fast) to 6 (small). Defaults to 0.
+        lossless (bool, optional): Whether to encode WebP losslessly. Defaults to False.
+        content_hash (str, optional): The precomputed hash of the input image content. Defaults to None.
 
     Returns:
-        tuple: A tuple containing the reopened image in RGBA format and the path to the saved image file.
+        tuple: A tuple containing the path to the preview image and the path to the saved image file.
     """
-    file_path = Path("caches") / "{}{}".format(Path(input_image).stem, ext)
-    file_path.parent.mkdir(parents=True, exist_ok=True)
-    img = Image.open(input_image)
-    # img = img.convert("RGBA")
-    format = None
-    if ext in SUPPORTED_FORMATS:
-        format = SUPPORTED_FORMATS[ext]
-    if format is None:
-        gr.Error(
+    if ext not in EXT_TO_PIL:
+        raise gr.Error(
             "Unsupported image format. Supported formats: {}".format(
-                ", ".join(SUPPORTED_FORMATS)
+                ", ".join(EXT_TO_PIL)
+            )
+        )
+    if content_hash is None:
+        content_hash = get_content_hash(input_image)
+    # the memo is keyed on content and file name, not on the temporary path,
+    # so a re-upload hits without handing out another upload's file name
+    params = get_save_params(EXT_TO_PIL[ext], quality, method, lossless)
+    key = (
+        content_hash,
+        get_output_stem(input_image),
+        ext,
+        tuple(sorted(params.items())),
+    )
+    with MEMO_LOCK:
+        result = MEMO.get(key)
+        if result is not None:
+            MEMO.move_to_end(key)
+    # skip memoized outputs that prune_cache has evicted from disk
+    if result is None or not all(map(os.path.exists, result)):
+        preview, file_path = convert_uncached(
+            content_hash, input_image, ext, quality, method, lossless
+        )
+        result = save_preview(preview, file_path), file_path
+        with MEMO_LOCK:
+            MEMO[key] = result
+            MEMO.move_to_end(key)
+            if len(MEMO) > MEMO_SIZE:
+                MEMO.popitem(last=False)
+    return result
+
+
+def convert_uncached(
+    content_hash: str,
+    input_image: str,
+    ext: str,
+    quality: int,
+    method: int,
+    lossless: bool,
+):
+    """
+    A function that converts an input image, reusing an output already on disk for the same content and encoder parameters.
+
+    Parameters:
+        content_hash (str): The hash of the input image content.
+        input_image (str): The path to the input image file.
+        ext (str): The extension for the output format.
+        quality (int): The quality of the output image.
+        method (int): The libwebp encoding method, 0 (fast) to 6 (small).
+        lossless (bool): Whether to encode WebP losslessly.
+
+    Returns:
+        tuple: A tuple containing the converted image in RGBA format and the path to the saved image file.
+    """
+    format = EXT_TO_PIL[ext]
+    params = get_save_params(format, quality, method, lossless)
+    file_path = get_output_path(input_image, content_hash, ext, params)
+    if file_path.exists():
+        # refresh the mtime so that prune_cache evicts it last
+        os.utime(file_path)
+        return load_preview(file_path), str(file_path)
+    if can_copy_source(input_image, format, quality, lossless):
+        # re-encoding would only add generation loss
+        write_atomic(file_path, Path(input_image).read_bytes())
+        return load_preview(input_image), str(file_path)
+    if pyvips is not None and format in VIPS_FORMATS:
+        try:
+            image = pyvips.Image.new_from_file(
+                input_image, access="sequential"
             )
+        except pyvips.Error:
+            image = None
+        large = (
+            image is not None
+            and image.width * image.height > LARGE_IMAGE_PIXELS
         )
-    img.save(file_path, format, quality=quality)
+        if large:
+            preview = convert_with_vips(
+                image,
+                input_image,
+                file_path,
+                format,
+                quality,
+                method,
+                lossless,
+            )
+            return preview, str(file_path)
+    with open_sequential(input_image) as f:
+        src = Image.open(f)
+        src.load()
+        # the input is not read again, the output is read back by Gradio
+        drop_page_cache(f)
+    out = get_save_image(src, format)
+    # encode in memory so the download file is written with a single call
+    write_atomic(file_path, encode_image(out, format, **params))
+    # the full-size source is no longer needed once it is saved
+    src.thumbnail(PREVIEW_SIZE, Image.Resampling.LANCZOS)
+    return src.convert("RGBA"), str(file_path)
 
-    # reopen and check
-    img_reopen = Image.open(file_path)
-    img_reopen = img_reopen.convert("RGBA")
-    return img_reopen, str(file_path)
 
+@lru_cache(maxsize=1)
+def get_process_pool():
+    """
+    A function that lazily creates the shared process pool for conversions.
+    Pillow plugins are loaded once per worker by the initializer.
 
-def process(input_list: list[tuple], ext: str = ".webp", quality: int = 80):
+    Returns:
+        ProcessPoolExecutor: The process pool.
+    """
+    return ProcessPoolExecutor(
+        max_workers=os.cpu_count(), initializer=Image.init
+    )
+
+
+def process(
+    input_list: list[tuple],
+    ext: str = ".webp",
+    quality: int = 80,
+    method: int = 0,
+    lossless: bool = False,
+    content_hashes: dict[str, str] = None,
+):
     """
     A function that processes a list of images by converting them to a specified format with a given quality.
 
@@ -58,27 +622,78 @@ def process(input_list: list[tuple], ext: str = ".webp", quality: int = 80):
         input_list (list[tuple]): A list of tuples containing the paths to the input image files.
         ext (str, optional): The extension for the output format. Defaults to ".webp".
         quality (int, optional): The quality of the output images. Defaults to 80.
+        method (int, optional): The libwebp encoding method, 0 (fast) to 6 (small). Defaults to 0.
+        lossless (bool, optional): Whether to encode WebP losslessly. Defaults to False.
+        content_hashes (dict[str, str], optional): The precomputed hashes of the uploaded images, keyed by path. Defaults to None.
 
-    Returns:
-        tuple: A tuple containing lists of file paths and reopened images in RGBA format.
+    Yields:
+        tuple: A tuple containing the list of file paths and the list of preview paths, growing as each image is converted.
     """
     out_files = []
     out_images = []
-    for path in input_list:
-        img_reopen, file_path = convert_format(path[0], ext, quality)
-        out_files.append(file_path)
-        out_images.append(img_reopen)
-    return out_files, out_images
+    if not input_list:
+        yield out_files, out_images
+        return
+    # paths missing from the upload-time hashes are hashed on conversion
+    content_hashes = content_hashes or {}
+    # outputs of earlier requests have been served, so evict before writing
+    prune_cache()
+    if USE_PROCESS_POOL:
+        # workers reopen the inputs, so only paths and options are pickled
+        executor = get_process_pool()
+    else:
+        # PIL releases the GIL inside its codecs, so threads overlap encode/IO
+        max_workers = min(len(input_list), os.cpu_count() or 1)
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+    futures = [
+        executor.submit(
+            convert_format,
+            path[0],
+            ext,
+            quality,
+            method,
+            lossless,
+            content_hashes.get(path[0]),
+        )
+        for path in input_list
+    ]
+    try:
+        # stream results in input order as soon as each one is ready
+        for future in futures:
+            preview_path, file_path = future.result()
+            out_files.append(file_path)
+            out_images.append(preview_path)
+            if len(out_files) < len(futures):
+                # Gradio re-hashes every listed download on each update,
+                # so the full-size outputs are sent once, with the last one
+                yield gr.update(), list(out_images)
+            else:
+                yield list(out_files), list(out_images)
+    finally:
+        # drop conversions that have not started when the consumer stops early
+        for future in futures:
+            future.cancel()
+        if not USE_PROCESS_POOL:
+            executor.shutdown(cancel_futures=True)
+
+
+def process_in_worker(*args):
+    """
+    A function that runs `process` on the worker thread and streams its results.
+    """
+    yield from run_and_stream_result(process, *args)
 
 
 def swap_to_gallery(images: list):
     """
     A function that swaps to a gallery, taking a list of images as input.
+    It also hashes the uploaded images once, so later conversions reuse the hashes.
     """
     return (
         gr.update(value=images, visible=True),
         gr.update(visible=True),
         gr.update(visible=False),
+        {image: get_content_hash(image) for image in images},
     )
 
 
@@ -111,6 +726,7 @@ def run(server_name: str = "127.0.0.1", server_port: int = 7860):
                 uploaded_files = gr.Gallery(
                     label="Your images", visible=False, columns=4, height="auto"
                 )
+                content_hashes = gr.State()
                 with gr.Row():
                     quality_slider = gr.Slider(
                         minimum=1,
@@ -121,18 +737,18 @@ def run(server_name: str = "127.0.0.1", server_port: int = 7860):
                     )
                     extension_dropdown = gr.Dropdown(
                         label="Output Format",
-                        choices=[
-                            ".webp",
-                            ".png",
-                            ".jpg",
-                            ".jpeg",
-                            ".gif",
-                            ".bmp",
-                            ".tiff",
-                            ".tif",
-                        ],
+                        choices=list(EXT_TO_PIL),
                         value=".webp",
                     )
+                with gr.Row():
+                    speed_radio = gr.Radio(
+                        label="WebP Speed",
+                        choices=list(WEBP_METHODS.items()),
+                        value=WEBP_METHODS["Fast"],
+                    )
+                    lossless_checkbox = gr.Checkbox(
+                        label="WebP Lossless", value=False
+                    )
                 with gr.Row():
                     reset_btn = gr.Button("Clear Images", variant="secondary")
                     proc_btn = gr.Button("Run Convert", variant="primary")
@@ -153,6 +769,9 @@ def run(server_name: str = "127.0.0.1", server_port: int = 7860):
             uploaded_files,
             extension_dropdown,
             quality_slider,
+            speed_radio,
+            lossless_checkbox,
+            content_hashes,
         ]
         outputs = [
             output_file,
@@ -163,13 +782,23 @@ def run(server_name: str = "127.0.0.1", server_port: int = 7860):
         files.upload(
             fn=swap_to_gallery,
             inputs=files,
-            outputs=[uploaded_files, proc_btn, files],
+            outputs=[uploaded_files, proc_btn, files, content_hashes],
         )
-        proc_btn.click(process, inputs=inputs, outputs=outputs)
-        reset_btn.click(lambda: None, None, uploaded_files, queue=False)
-    app.queue().launch(
-        server_name=server_name, server_port=server_port, share=False
-    )
+        proc_btn.click(
+            process_in_worker,
+            inputs=inputs,
+            outputs=outputs,
+        )
+        reset_btn.click(
+            lambda: (None, None),
+            None,
+            [uploaded_files, content_hashes],
+            queue=False,
+        )
+    app.queue(
+        max_size=QUEUE_MAX_SIZE,
+        api_open=False,
+    ).launch(server_name=server_name, server_port=server_port, share=False)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,122 @@
+import queue
+import threading
+
+lock = threading.Lock()
+last_id = 0
+waiting_queue = queue.Queue()
+
+
+class Task:
+    """
+    A class that holds a function call to be run on the worker thread.
+    """
+
+    def __init__(self, task_id: int, func, args: tuple, kwargs: dict):
+        self.task_id = task_id
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.result = None
+        self.exception = None
+        self.done = threading.Event()
+
+    def work(self):
+        """
+        A function that runs the task and stores its result or exception.
+        """
+        try:
+            self.result = self.func(*self.args, **self.kwargs)
+        except Exception as e:
+            # re-raised by the caller, which decides whether to report it
+            self.exception = e
+        finally:
+            self.done.set()
+
+
+def loop():
+    """
+    A function that runs queued tasks one at a time, forever.
+    """
+    while True:
+        task = waiting_queue.get()
+        task.work()
+
+
+def async_run(func, *args, **kwargs) -> Task:
+    """
+    A function that queues a function call on the worker thread.
+
+    Parameters:
+        func (callable): The function to call.
+        *args: The positional arguments for the function.
+        **kwargs: The keyword arguments for the function.
+
+    Returns:
+        Task: The queued task.
+    """
+    global last_id
+    with lock:
+        last_id += 1
+        task = Task(last_id, func, args, kwargs)
+    waiting_queue.put(task)
+    return task
+
+
+def run_and_wait_result(func, *args, **kwargs):
+    """
+    A function that runs a function call on the worker thread and waits for it.
+
+    Parameters:
+        func (callable): The function to call.
+        *args: The positional arguments for the function.
+        **kwargs: The keyword arguments for the function.
+
+    Returns:
+        The return value of the function, its exception is re-raised.
+    """
+    task = async_run(func, *args, **kwargs)
+    task.done.wait()
+    if task.exception is not None:
+        raise task.exception
+    return task.result
+
+
+def run_and_stream_result(func, *args, **kwargs):
+    """
+    A function that runs a generator function on the worker thread and yields its results as they arrive.
+    Closing the returned generator stops and closes the function's generator at its next yield.
+
+    Parameters:
+        func (callable): The generator function to call.
+        *args: The positional arguments for the function.
+        **kwargs: The keyword arguments for the function.
+
+    Yields:
+        The values yielded by the function, its exception is re-raised.
+    """
+    results = queue.Queue()
+    finished = object()
+    stop = threading.Event()
+
+    def drain():
+        generator = func(*args, **kwargs)
+        try:
+            for result in generator:
+                if stop.is_set():
+                    break
+                results.put(result)
+        finally:
+            # closing runs the generator's own cleanup, e.g. cancelling work
+            generator.close()
+            results.put(finished)
+
+    task = async_run(drain)
+    try:
+        while (result := results.get()) is not finished:
+            yield result
+    finally:
+        # a consumer that stops early must not keep the worker busy
+        stop.set()
+    task.done.wait()
+    if task.exception is not None:
+        raise task.exception